@@ -27,7 +27,6 @@ class PDFFieldMapper:
             "description": "Generated by PDF Field Mapper",
             "empty_form_file": "",
             "output_file": "output/filled_form.pdf",
-            "temp_overlay_file": "temp_overlay.pdf",
             "font_size": 10,
             "font_path": "fonts/AdobeClean-SemiLight.ttf",
             "default_letter_spacing": 13,
@@ -1,10 +1,29 @@
 import os
+import re
 import shutil
 import csv
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 import argparse
 from datetime import datetime
 
+# Optional fast charset detection (cchardet preferred, chardet as fallback)
+try:
+    import cchardet as chardet
+except ImportError:
+    try:
+        import chardet
+    except ImportError:
+        chardet = None
+
+# Common email encodings, tried in order when detection is unavailable or fails
+FALLBACK_ENCODINGS = ['utf-8', 'iso-8859-1', 'windows-1252']
+
+# Number of leading bytes inspected when detecting the encoding
+DETECTION_SAMPLE_SIZE = 4096
+
 def batch_process_emails(csv_path, template_dir, output_dir):
     """
     Process multiple email templates with multiple sets of replacements
@@ -26,6 +45,13 @@ def batch_process_emails(csv_path, template_dir, output_dir):
         with open(csv_path, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             rows = list(reader)
+            columns = reader.fieldnames or []
+        
+        # Pair up *_old/*_new columns once instead of scanning every row's columns
+        replacement_columns = [
+            (col, col[:-4] + '_new') for col in columns
+            if col.endswith('_old') and col[:-4] + '_new' in columns
+        ]
             
         if not rows:
             print("No data found in CSV file")
@@ -39,20 +65,19 @@ def batch_process_emails(csv_path, template_dir, output_dir):
             
         print(f"Found {len(template_files)} templates and {len(rows)} replacement sets")
         
-        # Process each template with each row of replacement data
-        successful_files = 0
+        # Build one task per template and replacement set
+        tasks = []
         for template_file in template_files:
             template_path = os.path.join(template_dir, template_file)
             template_name = os.path.splitext(template_file)[0]
             
             for i, row in enumerate(rows):
                 # Create a dictionary of replacements from the row
-                replacements = {}
-                for key, value in row.items():
-                    if key.endswith('_old') and value:
-                        new_key = key.replace('_old', '_new')
-                        if new_key in row:
-                            replacements[value] = row[new_key]
+                replacements = {
+                    row[old_key]: row[new_key]
+                    for old_key, new_key in replacement_columns
+                    if row.get(old_key) and row.get(new_key) is not None
+                }
                 
                 if not replacements:
                     print(f"Warning: No valid replacements found for row {i+1}")
@@ -63,9 +88,19 @@ def batch_process_emails(csv_path, template_dir, output_dir):
                 output_file = f"{template_name}_set{i+1}_{timestamp}.eml"
                 output_path = os.path.join(output_dir, output_file)
                 
-                print(f"\nProcessing template: {template_file} with replacement set {i+1}")
-                if replace_in_eml(template_path, output_path, replacements):
-                    successful_files += 1
+                print(f"\nQueued template: {template_file} with replacement set {i+1}")
+                tasks.append((template_path, output_path, replacements))
+        
+        # Every email is independent, so spread them across worker processes;
+        # a single email is not worth starting a pool for
+        successful_files = 0
+        if len(tasks) == 1:
+            successful_files = int(replace_in_eml(*tasks[0]))
+        elif tasks:
+            max_workers = min(len(tasks), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(replace_in_eml, *task) for task in tasks]
+                successful_files = sum(1 for future in as_completed(futures) if future.result())
         
         print(f"\nBatch processing complete. Created {successful_files} email files.")
         return successful_files > 0
@@ -74,47 +109,129 @@ def batch_process_emails(csv_path, template_dir, output_dir):
         print(f"Error during batch processing: {e}")
         return False
 
+def decode_eml_content(content_bytes):
+    """
+    Decode raw email bytes, returning the text and the encoding used.
+    The encoding is detected from a short prefix when chardet is available;
+    the fallback list is only walked if that guess fails to decode.
+    """
+    # Pure ASCII content (the common case) needs no detection at all
+    if content_bytes.isascii():
+        return content_bytes.decode('ascii'), 'utf-8'
+    
+    encodings = list(FALLBACK_ENCODINGS)
+    
+    if chardet is not None:
+        result = chardet.detect(content_bytes[:DETECTION_SAMPLE_SIZE])
+        detected = (result.get('encoding') or '').lower()
+        if detected and (result.get('confidence') or 0) >= 0.5:
+            # Headers are usually plain ASCII, utf-8 is the safe superset
+            if detected == 'ascii':
+                detected = 'utf-8'
+            encodings.insert(0, detected)
+    
+    for encoding in encodings:
+        try:
+            return content_bytes.decode(encoding), encoding
+        except (UnicodeDecodeError, LookupError):
+            continue
+    
+    # Fallback with replacement for errors
+    return content_bytes.decode('utf-8', errors='replace'), 'utf-8'
+
+@lru_cache(maxsize=256)
+def compile_replacement_pattern(keys):
+    """
+    Compile a tuple of replacement keys (str or bytes) into a single alternation regex.
+    Longer keys are tried first so overlapping keys match the longest text.
+    Cached so rows sharing the same keys reuse the compiled pattern.
+    """
+    ordered = sorted((k for k in keys if k), key=len, reverse=True)
+    if not ordered:
+        return None
+    separator = b'|' if isinstance(ordered[0], bytes) else '|'
+    return re.compile(separator.join(re.escape(k) for k in ordered))
+
+def load_eml_template(input_file):
+    """
+    Read an email template once, returning its raw bytes and detected encoding
+    so it can be reused for many replacement sets.
+    """
+    with open(input_file, 'rb') as f:
+        content_bytes = f.read()
+    
+    _, encoding = decode_eml_content(content_bytes)
+    return content_bytes, encoding
+
+def apply_eml_replacements(content_bytes, replacements, encoding=None, log_prefix=''):
+    """
+    Apply replacements to raw email bytes in a single pass.
+    Returns the new bytes (None when nothing was replaced) and the number of
+    replacements made. The encoding is only needed for non-ASCII replacements
+    and is detected when not supplied. log_prefix is put in front of the
+    per-replacement messages, so output from parallel workers stays attributable.
+    """
+    if all(old.isascii() and new.isascii() for old, new in replacements.items()):
+        # ASCII-only replacements work directly on the raw bytes of any
+        # ASCII-compatible email encoding, no decode/encode round-trip needed
+        table = {old.encode('ascii'): new.encode('ascii') for old, new in replacements.items()}
+    else:
+        table = replacements
+    
+    pattern = compile_replacement_pattern(tuple(table))
+    if pattern is None:
+        return None, 0
+    
+    if table is replacements:
+        if encoding:
+            content = content_bytes.decode(encoding, errors='replace')
+        else:
+            content, encoding = decode_eml_content(content_bytes)
+    else:
+        content = content_bytes
+        encoding = None
+    
+    # Drop our reference to the raw buffer so it can be freed before the
+    # replace pass allocates the new content
+    del content_bytes
+    
+    counts = Counter()
+    
+    def substitute(match):
+        old_text = match.group(0)
+        counts[old_text] += 1
+        return table[old_text]
+    
+    content, replacements_made = pattern.subn(substitute, content)
+    
+    for old_text, count in counts.items():
+        if isinstance(old_text, bytes):
+            old_text = old_text.decode('ascii')
+        print(f"  {log_prefix}Replaced '{old_text}' with '{replacements[old_text]}': {count} times")
+    
+    if not replacements_made:
+        return None, 0
+    
+    # Re-encode with the same encoding as the original file
+    if encoding:
+        content = content.encode(encoding)
+    return content, replacements_made
+
 def replace_in_eml(input_file, output_file, replacements):
     """
     Replace content in .eml file while preserving the exact format.
     """
     try:
-        # Read the file in binary mode
+        # Read the file in binary mode, handing the buffer straight over so
+        # apply_eml_replacements holds the only reference to it
         with open(input_file, 'rb') as f:
-            content_bytes = f.read()
-        
-        # Detect encoding - try common email encodings
-        encodings = ['utf-8', 'iso-8859-1', 'windows-1252']
-        detected_encoding = None
-        
-        for encoding in encodings:
-            try:
-                content = content_bytes.decode(encoding)
-                detected_encoding = encoding
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if not detected_encoding:
-            # Fallback with replacement for errors
-            content = content_bytes.decode('utf-8', errors='replace')
-            detected_encoding = 'utf-8'
-        
-        # Make the replacements
-        original_content = content
-        replacements_made = 0
-        
-        for old_text, new_text in replacements.items():
-            count = content.count(old_text)
-            if count > 0:
-                content = content.replace(old_text, new_text)
-                replacements_made += count
-                print(f"  Replaced '{old_text}' with '{new_text}': {count} times")
+            content_bytes, replacements_made = apply_eml_replacements(
+                f.read(), replacements, log_prefix=f"{os.path.basename(output_file)}: "
+            )
         
-        if content != original_content:
-            # Write the modified content back to the file with the same encoding
+        if replacements_made:
             with open(output_file, 'wb') as f:
-                f.write(content.encode(detected_encoding))
+                f.write(content_bytes)
             print(f"  Success: Made {replacements_made} replacements in {os.path.basename(output_file)}")
             return True
         else:
@@ -1,24 +1,55 @@
 from reportlab.pdfgen import canvas
-from PyPDF2 import PdfReader, PdfWriter
+import pikepdf
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import os
 import json
+import io
 import csv
 import sys
 import argparse
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import pdfplumber
 import re
+import math
+from collections import defaultdict, deque
+from typing import NamedTuple
 import logging
+import logging.handlers
+import functools
+import itertools
 from reportlab.lib.colors import white
 
+# Optional faster JSON parsing for form configs (orjson), stdlib json as fallback
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 # Constants
 CONFIG_DIR = "forms_config"
 FORMS_DIR = "forms"
 OUTPUT_DIR = "output"
 DATA_DIR = "data"
-TEMP_OVERLAY = "temp_overlay.pdf"
+
+# Rows per batch chunk; each chunk shares one overlay document
+BATCH_CHUNK_SIZE = 4
+
+# Write buffer for output PDFs (filled forms are typically ~250 KB)
+OUTPUT_WRITE_BUFFER_SIZE = 1 << 20
+
+# Rows each pool worker must have to fill before a batch is spread over processes;
+# a spawned worker takes ~0.25 s to start while a row takes ~10 ms in-process
+POOL_MIN_ROWS_PER_WORKER = 50
+
+# Log batch progress once per this many rows (per-row details are logged at debug level)
+PROGRESS_LOG_INTERVAL = 100
+
+# Log records held in memory before being written out in batch mode
+LOG_BUFFER_CAPACITY = 256
 
 # Default configuration
 DEFAULT_CONFIG = {
@@ -26,6 +57,19 @@ DEFAULT_CONFIG = {
     "default_letter_spacing": 13
 }
 
+class Rect(NamedTuple):
+    """Position of a field box in top-left origin PDF coordinates"""
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    page: int = 0
+
+    @classmethod
+    def from_dict(cls, coords):
+        """Build a Rect from a field_coordinates entry"""
+        return cls(coords["x0"], coords["y0"], coords["x1"], coords["y1"], coords.get("page", 0))
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -34,6 +78,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def buffer_log_output(capacity=LOG_BUFFER_CAPACITY):
+    """Wrap the root log handlers so records are written in blocks, warnings and errors flush immediately"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        root.addHandler(logging.handlers.MemoryHandler(capacity, flushLevel=logging.WARNING, target=handler))
+
 def check_path_exists(path, message=None):
     """Check if a path exists and log message if not"""
     if not os.path.exists(path):
@@ -44,48 +95,60 @@ def check_path_exists(path, message=None):
 
 def ensure_dir_exists(directory):
     """Ensure a directory exists, create if it doesn't"""
-    if not os.path.exists(directory):
+    try:
         os.makedirs(directory)
         logger.info(f"Created {directory} directory")
+    except FileExistsError:
+        # Already there (possibly created concurrently by another process)
+        pass
     return True
 
+@functools.lru_cache(maxsize=32)
+def read_form_config(config_path, mtime):
+    """Parse a form configuration file, cached per path and modification time"""
+    with open(config_path, 'rb') as f:
+        config = json_loads(f.read())
+    
+    # Apply defaults if needed
+    for key, value in DEFAULT_CONFIG.items():
+        if key not in config:
+            config[key] = value
+    
+    return config
+
 def load_form_config(form_type):
-    """Load form configuration from JSON file"""
+    """Load form configuration from JSON file (shared cached dict, do not mutate)"""
     config_path = os.path.join(CONFIG_DIR, f"{form_type}.json")
     
     if not check_path_exists(config_path):
         return None
     
     try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-        
-        # Apply defaults if needed
-        for key, value in DEFAULT_CONFIG.items():
-            if key not in config:
-                config[key] = value
-                
-        return config
+        return read_form_config(config_path, os.path.getmtime(config_path))
     except Exception as e:
         logger.error(f"Error loading configuration: {e}")
         return None
 
+@functools.lru_cache(maxsize=1)
+def scan_form_configs(config_dir, dir_mtime):
+    """Scan a config directory for form configurations, cached per directory modification time"""
+    # scandir entries carry the dirent type, so is_file() needs no extra stat call
+    with os.scandir(config_dir) as entries:
+        return tuple(entry.name[:-len('.json')] for entry in entries
+                     if entry.name.endswith('.json') and entry.is_file())
+
 def list_available_forms():
     """List all available form configurations"""
     if not check_path_exists(CONFIG_DIR, "Forms config directory not found"):
         return []
     
-    forms = []
-    for filename in os.listdir(CONFIG_DIR):
-        if filename.endswith('.json'):
-            forms.append(filename.split('.')[0])
-    
-    return forms
+    # Adding or removing a config updates the directory mtime, which invalidates the cache
+    return list(scan_form_configs(CONFIG_DIR, os.stat(CONFIG_DIR).st_mtime_ns))
 
 def convert_coords(orig, page_height):
     """Convert coordinates from top-left to bottom-left origin"""
-    new_y0 = page_height - orig["y1"]
-    new_y1 = page_height - orig["y0"]
+    new_y0 = page_height - orig.y1
+    new_y1 = page_height - orig.y0
     return new_y0, new_y1
 
 def extract_text_with_positions(pdf_path):
@@ -113,8 +176,9 @@ def extract_text_with_positions(pdf_path):
         logger.error(f"Error extracting text: {e}")
         return []
 
-def find_field_positions(pdf_path, field_names):
-    """Find positions of fields in the PDF based on common field labels"""
+@functools.lru_cache(maxsize=32)
+def find_label_positions(pdf_path):
+    """Find positions of common field labels in the PDF, cached per file"""
     text_positions = extract_text_with_positions(pdf_path)
     field_positions = {}
     
@@ -138,104 +202,153 @@ def find_field_positions(pdf_path, field_names):
             if any(label == text for label in labels) and i < len(text_positions) - 1:
                 # The field value is likely to be after the label
                 next_pos = text_positions[i+1]
-                field_positions[field] = {
-                    'x0': next_pos['x0'],
-                    'y0': next_pos['y0'],
-                    'x1': next_pos['x1'],
-                    'y1': next_pos['y1'],
-                    'page': next_pos['page']
-                }
-                logger.info(f"Found position for {field}: {field_positions[field]}")
+                field_positions[field] = Rect.from_dict(next_pos)
+                logger.info("Found position for %s: %s", field, field_positions[field])
     
     return field_positions
 
+def find_field_positions(pdf_path, field_names):
+    """Find positions of fields in the PDF based on common field labels"""
+    return {field: position for field, position in find_label_positions(pdf_path).items()
+            if field in field_names}
+
 def find_id_position(text_positions, id_pattern=None):
     """Always return None to force using exact coordinates"""
     return None
 
 def process_multi_char_field(mapping, field_name, field_value, position_keys, default_spacing):
     """Process a field with multiple character positions"""
-    logger.info(f"Processing {field_name} field with value: {field_value}")
+    logger.debug("Processing %s field with value: %s", field_name, field_value)
     letters_input = list(field_value)
     
     # Check if position_keys is empty, create a new position if needed
     if not position_keys:
-        logger.info(f"No position keys found for {field_name}, creating default position")
+        logger.debug("No position keys found for %s, creating default position", field_name)
         # Create a default position based on existing mappings
         key_name = f"default_{field_name}"
         
-        # Find other fields with valid positions to use as reference
-        reference_position = None
-        for key, pos in mapping.items():
-            if all(coord in pos for coord in ["x0", "y0", "x1", "y1", "page"]):
-                reference_position = pos
-                break
+        # Use another field's position as reference
+        reference_position = next(iter(mapping.values()), None)
         
         # Use reference or create generic position
         if reference_position:
-            mapping[key_name] = {
-                "x0": reference_position["x0"],
-                "y0": reference_position["y0"] + 30,  # Offset vertically
-                "x1": reference_position["x1"],
-                "y1": reference_position["y1"] + 30,
-                "page": reference_position["page"]
-            }
+            mapping[key_name] = reference_position._replace(
+                y0=reference_position.y0 + 30,  # Offset vertically
+                y1=reference_position.y1 + 30
+            )
         else:
             # Fallback to generic position
-            mapping[key_name] = {
-                "x0": 100.0,
-                "y0": 400.0,
-                "x1": 110.0,
-                "y1": 410.0,
-                "page": 0
-            }
+            mapping[key_name] = Rect(100.0, 400.0, 110.0, 410.0, 0)
         position_keys = [key_name]
     
     if len(letters_input) > len(position_keys):
-        # Calculate average spacing between letters
-        deltas = []
+        # Average spacing between letters; the sum of neighbouring gaps telescopes
+        # to the distance between the first and last position
         if len(position_keys) > 1:
-            for i in range(1, len(position_keys)):
-                delta = mapping[position_keys[i]]["x0"] - mapping[position_keys[i-1]]["x0"]
-                deltas.append(delta)
-            
-            # Use average spacing for consistency
-            if deltas:
-                delta = sum(deltas) / len(deltas)
-            else:
-                delta = default_spacing
+            first_x0 = mapping[position_keys[0]].x0
+            delta = (mapping[position_keys[-1]].x0 - first_x0) / (len(position_keys) - 1)
         else:
             delta = default_spacing
         
-        # Extend positions for additional letters
+        # Extend positions for additional letters, stepping from the last known position
+        last = mapping[position_keys[-1]]
+        base_index = len(position_keys) - 1
         for i in range(len(position_keys), len(letters_input)):
-            last_key = position_keys[-1]
-            new_x0 = mapping[last_key]["x0"] + delta
-            new_x1 = mapping[last_key]["x1"] + delta
-            
+            offset = (i - base_index) * delta
             new_key = f"auto_{field_name}_{i}"
-            mapping[new_key] = {
-                "x0": new_x0,
-                "y0": mapping[last_key]["y0"],
-                "x1": new_x1,
-                "y1": mapping[last_key]["y1"],
-                "page": mapping[last_key]["page"]
-            }
+            mapping[new_key] = Rect(last.x0 + offset, last.y0, last.x1 + offset, last.y1, last.page)
             position_keys.append(new_key)
-            
-            # Update the last key for next iteration
-            last_key = new_key
         
-        position_keys = sorted(position_keys, key=lambda k: mapping[k]["x0"])
+        # The keys from get_field_keys are sorted by x0 and each new key sits delta
+        # to the right of the previous one, so the list is still in order
+        if __debug__:
+            assert all(mapping[a].x0 <= mapping[b].x0
+                       for a, b in zip(position_keys, position_keys[1:])), \
+                f"{field_name} positions are not sorted left to right"
     
     return position_keys
 
-def get_field_keys(config):
-    """Extract field keys based on the form configuration"""
-    mapping = config["field_coordinates"]
+def index_mapping_keys(mapping, prefix_length):
+    """
+    Index the mapping keys in a single pass: single alpha/digit keys are
+    bucketed by their floored y0, all keys are grouped by their first
+    prefix_length characters (each group sorted left to right).
+    Each entry keeps its position in the mapping so sorts stay stable.
+    """
+    char_buckets = {"alpha": defaultdict(list), "digit": defaultdict(list)}
+    prefix_buckets = defaultdict(list)
+    
+    for index, (k, rect) in enumerate(mapping.items()):
+        if len(k) == 1:
+            if k.isdigit():
+                char_buckets["digit"][math.floor(rect.y0)].append((index, k))
+            elif k.isalpha():
+                char_buckets["alpha"][math.floor(rect.y0)].append((index, k))
+        prefix_buckets[k[:prefix_length]].append(k)
+    
+    for bucket in prefix_buckets.values():
+        bucket.sort(key=lambda k: mapping[k].x0)
+    
+    return char_buckets, prefix_buckets
+
+def find_row_keys(mapping, buckets, y_coord, tolerance):
+    """Return the keys of one character bucket type lying within tolerance of y_coord, left to right"""
+    matches = []
+    for y in range(math.floor(y_coord - tolerance), math.floor(y_coord + tolerance) + 1):
+        for index, k in buckets.get(y, ()):
+            if abs(mapping[k].y0 - y_coord) < tolerance:
+                matches.append((mapping[k].x0, index, k))
+    return [k for _, _, k in sorted(matches)]
+
+def find_prefix_keys(mapping, prefix_buckets, prefix_length, prefix):
+    """Return the keys starting with prefix, left to right"""
+    if prefix and len(prefix) >= prefix_length:
+        # Buckets are already sorted by x0, filtering keeps that order
+        return [k for k in prefix_buckets.get(prefix[:prefix_length], ()) if k.startswith(prefix)]
+    prefix_keys = [k for k in mapping if k.startswith(prefix)]
+    return sorted(prefix_keys, key=lambda k: mapping[k].x0)
+
+def find_datum_key(mapping, identifiers, keys_containing):
+    """
+    Return the first mapping key matching the datum identifiers, or None.
+    keys_containing caches, per required substring, the mapping keys containing it
+    so identifiers sharing a substring reuse one scan of the mapping.
+    """
+    substrings = [identifiers[condition] for condition in ("contains", "contains_also")
+                  if condition in identifiers]
+    for substring in substrings:
+        if substring not in keys_containing:
+            keys_containing[substring] = [k for k in mapping if substring in k]
+    
+    # Only walk the keys containing the rarest required substring
+    if substrings:
+        candidates = min((keys_containing[substring] for substring in substrings), key=len)
+    else:
+        candidates = mapping
+    
+    excluded = identifiers.get("not_equals")
+    for k in candidates:
+        if k != excluded and all(substring in k for substring in substrings):
+            return k
+    return None
+
+def build_rects(field_coordinates):
+    """Convert the field_coordinates of a config into a mapping of Rects"""
+    return {key: Rect.from_dict(coords) for key, coords in field_coordinates.items()}
+
+def get_field_keys(config, mapping=None):
+    """Extract field keys based on the form configuration (mapping defaults to its coordinates as Rects)"""
+    if mapping is None:
+        mapping = build_rects(config["field_coordinates"])
     field_config = config["field_config"]
     field_keys = {}
     
+    # Index the mapping once instead of scanning it for every field, grouping keys
+    # by the length of the shortest configured prefix so every prefix can use the index
+    prefix_length = min((len(field_conf["prefix"]) for field_conf in field_config.values()
+                         if field_conf.get("prefix")), default=1)
+    char_buckets, prefix_buckets = index_mapping_keys(mapping, prefix_length)
+    
     # Process fields according to their configuration
     for field_name, field_conf in field_config.items():
         if "y_coord" in field_conf:
@@ -249,50 +362,46 @@ def get_field_keys(config):
                 else:
                     field_type = "alpha"
             
-            # Select keys based on field type
-            if field_type == "digit":
-                keys = [k for k in mapping if len(k) == 1 and k.isdigit() and 
-                        abs(mapping[k]["y0"] - field_conf["y_coord"]) < field_conf["tolerance"]]
-            else:
-                # Default to character field
-                keys = [k for k in mapping if len(k) == 1 and k.isalpha() and 
-                        abs(mapping[k]["y0"] - field_conf["y_coord"]) < field_conf["tolerance"]]
-                
-            # Sort the keys by x-coordinate (left to right)
-            field_keys[field_name] = sorted(keys, key=lambda k: mapping[k]["x0"])
+            # Select keys based on field type (default to character field), sorted left to right
+            buckets = char_buckets["digit" if field_type == "digit" else "alpha"]
+            field_keys[field_name] = find_row_keys(
+                mapping, buckets, field_conf["y_coord"], field_conf["tolerance"]
+            )
             
             # Log details for debugging
             logger.info(f"Found {len(field_keys[field_name])} positions for {field_name} field")
         elif "prefix" in field_conf:
             # Field identified by prefix
-            prefix_keys = [k for k in mapping if k.startswith(field_conf["prefix"])]
-            field_keys[field_name] = sorted(prefix_keys, key=lambda k: mapping[k]["x0"])
+            field_keys[field_name] = find_prefix_keys(mapping, prefix_buckets, prefix_length, field_conf["prefix"])
         elif "exact_key" in field_conf:
             # Field with an exact key
             field_keys[field_name] = field_conf["exact_key"]
     
     # Get datum keys based on identifiers
     if "datum_identifiers" in config:
+        keys_containing = {}
         for datum_field, identifiers in config["datum_identifiers"].items():
             if "exact_key" in identifiers:
                 field_keys[datum_field] = identifiers["exact_key"]
             else:
                 # Find key based on contains conditions
-                for k in mapping:
-                    matches = True
-                    for condition, value in identifiers.items():
-                        if condition == "contains" and value not in k:
-                            matches = False
-                        elif condition == "not_equals" and k == value:
-                            matches = False
-                        elif condition == "contains_also" and value not in k:
-                            matches = False
-                    if matches:
-                        field_keys[datum_field] = k
-                        break
+                datum_key = find_datum_key(mapping, identifiers, keys_containing)
+                if datum_key is not None:
+                    field_keys[datum_field] = datum_key
     
     return field_keys
 
+# Names of the TTF fonts already registered with ReportLab in this process
+_REGISTERED_FONTS = set()
+
+def register_font(font_name, font_path):
+    """Parse and register a TTF font, at most once per process"""
+    if font_name in _REGISTERED_FONTS:
+        return
+    pdfmetrics.registerFont(TTFont(font_name, font_path))
+    _REGISTERED_FONTS.add(font_name)
+    logger.info(f"{font_name} font registered successfully")
+
 def setup_font(config):
     """Set up and register fonts"""
     if "font_path" not in config or not check_path_exists(config["font_path"], 
@@ -302,8 +411,7 @@ def setup_font(config):
     try:
         font_file = os.path.basename(config["font_path"])
         font_name = os.path.splitext(font_file)[0]
-        pdfmetrics.registerFont(TTFont(font_name, config["font_path"]))
-        logger.info(f"{font_name} font registered successfully")
+        register_font(font_name, config["font_path"])
         
         # Try to register bold font if it exists
         bold_font_path = config.get("bold_font_path")
@@ -312,8 +420,7 @@ def setup_font(config):
         if bold_font_path and check_path_exists(bold_font_path):
             bold_font_file = os.path.basename(bold_font_path)
             bold_font_name = os.path.splitext(bold_font_file)[0]
-            pdfmetrics.registerFont(TTFont(bold_font_name, bold_font_path))
-            logger.info(f"{bold_font_name} bold font registered successfully")
+            register_font(bold_font_name, bold_font_path)
         
         return font_name, bold_font_name
     except Exception as e:
@@ -329,71 +436,52 @@ def draw_bold_text(c, x, y, text, font_size):
     for dx in offsets:
         c.drawString(x + dx, y, text)
 
-def prepare_overlay_canvas(empty_form, temp_overlay, font_name, font_size):
+def prepare_overlay_canvas(overlay_buffer, width, height):
     """Prepare canvas for overlay"""
-    # Open empty form to get dimensions
-    reader = PdfReader(empty_form)
-    page0 = reader.pages[0]
-    width = float(page0.mediabox.width)
-    height = float(page0.mediabox.height)
-    
-    # Create canvas for overlay
-    c = canvas.Canvas(temp_overlay, pagesize=(width, height))
-    c.setFont(font_name, font_size)
-    
-    return c, reader, width, height
-
-def draw_character_fields(c, mapping, field_keys, form_data, height):
-    """Draw character fields like name and vorname"""
-    for field_name, keys in field_keys.items():
-        if not isinstance(keys, list) or field_name.startswith("datum"):
-            continue
-            
+    # The overlay is only an intermediate; pikepdf compresses its streams when saving the output
+    return canvas.Canvas(overlay_buffer, pagesize=(width, height), pageCompression=0)
+
+def draw_character_fields(c, char_positions, field_names, form_data):
+    """Draw character fields like name and vorname; char_positions maps each field to its (xs, ys) lists"""
+    for field_name in field_names:
         # Skip if field is not in form_data
         if field_name not in form_data:
             continue
-            
-        for idx, key in enumerate(keys):
-            if idx >= len(form_data[field_name]):
-                continue
-            orig = mapping[key]
-            new_y0, _ = convert_coords(orig, height)
-            x = orig["x0"]
-            c.drawString(x, new_y0, form_data[field_name][idx])
-
-def draw_datum_fields(c, mapping, field_keys, form_data, height):
-    """Draw datum fields"""
-    for field_name in field_keys:
-        if not field_name.startswith("datum") and field_name != "geburtsdatum":
+        
+        value = form_data[field_name]
+        xs, ys = char_positions[field_name]
+        count = min(len(value), len(xs))
+        if not count:
             continue
-            
+        
+        # Emit the whole field as one text object, moving the cursor between characters
+        text = c.beginText(xs[0], ys[0])
+        text.textOut(value[0])
+        for i in range(1, count):
+            # moveCursor offsets are relative to the previous character, y pointing down
+            text.moveCursor(xs[i] - xs[i - 1], ys[i - 1] - ys[i])
+            text.textOut(value[i])
+        c.drawText(text)
+
+def draw_datum_fields(c, draw_positions, field_names, field_keys, form_data):
+    """Draw datum fields"""
+    for field_name in field_names:
         # Skip if datum is not in form_data
-        if field_name == "geburtsdatum":
-            if field_name not in form_data:
-                continue
-            datum_rect = mapping[field_keys[field_name]]
-            datum_new_y0, _ = convert_coords(datum_rect, height)
-            c.drawString(datum_rect["x0"], datum_new_y0, form_data[field_name])
-        elif field_name in form_data:  # Changed to check if the specific datum field exists
-            # Use the actual field name from form_data rather than hardcoded "datum"
-            datum_rect = mapping[field_keys[field_name]]
-            datum_new_y0, _ = convert_coords(datum_rect, height)
-            c.drawString(datum_rect["x0"], datum_new_y0, form_data[field_name])
-
-
-def draw_checkbox_fields(c, mapping, field_keys, height):
-    """Draw checkbox fields (x markers)"""
-    for field_name in field_keys:
-        if not field_name.startswith("x"):
+        if field_name not in form_data:
             continue
-            
-        x_rect = mapping[field_keys[field_name]]
-        x_new_y0, _ = convert_coords(x_rect, height)
-        c.drawString(x_rect["x0"], x_new_y0, "x")
+        datum_x0, datum_new_y0 = draw_positions[field_keys[field_name]]
+        c.drawString(datum_x0, datum_new_y0, form_data[field_name])
+
 
-def draw_exact_key_fields(c, mapping, field_keys, field_config, form_data, height, id_position, bold_font_name, font_name, font_size):
+def draw_checkbox_fields(c, draw_positions, field_names, field_keys):
+    """Draw checkbox fields (x markers)"""
+    for field_name in field_names:
+        x_x0, x_new_y0 = draw_positions[field_keys[field_name]]
+        c.drawString(x_x0, x_new_y0, "x")
+
+def draw_exact_key_fields(c, mapping, draw_positions, field_names, field_config, form_data, id_position, bold_font_name, font_name, font_size):
     """Draw fields with exact keys like hausnummer and ID"""
-    for field_name in field_config:
+    for field_name in field_names:
         # Skip if the field is not in form_data
         if field_name not in form_data:
             continue
@@ -402,16 +490,16 @@ def draw_exact_key_fields(c, mapping, field_keys, field_config, form_data, heigh
         if field_name == "ID" and "id_field" in mapping:
             # Use exact coordinates from configuration
             rect = mapping["id_field"]
-            new_y0, _ = convert_coords(rect, height)
+            _, new_y0 = draw_positions["id_field"]
             
             # Draw white rectangle to cover existing ID
             padding = 2
             c.setFillColor(white)
             c.rect(
-                rect["x0"] - padding, 
+                rect.x0 - padding, 
                 new_y0 - padding,
-                (rect["x1"] - rect["x0"]) + (padding * 2), 
-                (rect["y1"] - rect["y0"]) + (padding * 2),
+                (rect.x1 - rect.x0) + (padding * 2), 
+                (rect.y1 - rect.y0) + (padding * 2),
                 fill=True, stroke=False
             )
             
@@ -421,64 +509,229 @@ def draw_exact_key_fields(c, mapping, field_keys, field_config, form_data, heigh
             # Draw ID with bold effect
             if bold_font_name:
                 c.setFont(bold_font_name, font_size)
-                c.drawString(rect["x0"], new_y0, form_data[field_name])
+                c.drawString(rect.x0, new_y0, form_data[field_name])
                 # Reset back to normal font
                 c.setFont(font_name, font_size)
             else:
-                draw_bold_text(c, rect["x0"], new_y0, form_data[field_name], font_size)
+                draw_bold_text(c, rect.x0, new_y0, form_data[field_name], font_size)
             
             continue
             
         # Handle other exact key fields
-        if "exact_key" in field_config[field_name] and field_name not in ["geburtsdatum"]:
-            exact_key = field_config[field_name]["exact_key"]
-            if exact_key in mapping:
-                rect = mapping[exact_key]
-                new_y0, _ = convert_coords(rect, height)
-                c.drawString(rect["x0"], new_y0, form_data[field_name])
-
-def merge_overlay_with_base(temp_overlay, empty_form, output_path):
-    """Merge overlay with base PDF"""
-    writer = PdfWriter()
-    base_reader = PdfReader(empty_form)
-    overlay_reader = PdfReader(temp_overlay)
-    
-    for i in range(len(base_reader.pages)):
-        base_page = base_reader.pages[i]
-        if i < len(overlay_reader.pages):
-            overlay_page = overlay_reader.pages[i]
-            base_page.merge_page(overlay_page)
-        writer.add_page(base_page)
-
-    # Create output directory if needed
-    output_dir = os.path.dirname(output_path)
-    if output_dir:
-        ensure_dir_exists(output_dir)
-
-    # Save filled form
-    with open(output_path, "wb") as f_out:
-        writer.write(f_out)
-
-    logger.info(f"PDF saved as {output_path}")
-    
-    # Clean up temporary files
-    if os.path.exists(temp_overlay):
-        os.remove(temp_overlay)
+        exact_key = field_config[field_name]["exact_key"]
+        if exact_key in draw_positions:
+            x0, new_y0 = draw_positions[exact_key]
+            c.drawString(x0, new_y0, form_data[field_name])
 
-def fill_pdf_form(form_type, form_data, output_file=None):
-    """Fill a PDF form with the provided data"""
-    # Load form configuration
+def merge_overlay_with_base(overlay_pages, base_pdf_bytes, output_path):
+    """Merge overlay pages (pikepdf pages) with base PDF; output_path may also be a writable binary file object"""
+    # Stamp each overlay page onto the matching base page (qpdf does the merge natively)
+    with pikepdf.open(io.BytesIO(base_pdf_bytes)) as base_pdf:
+        for base_page, overlay_page in zip(base_pdf.pages, overlay_pages):
+            base_page.add_overlay(overlay_page)
+
+        save_pdf(base_pdf, output_path)
+
+def save_pdf(pdf, output_path):
+    """Save a pikepdf document to a path or a writable binary file object"""
+    # File objects (e.g. an HTTP response buffer) are written to directly
+    if hasattr(output_path, "write"):
+        pdf.save(output_path, linearize=False)
+        return
+
+    # Stream the filled form straight into the output file; the write buffer is
+    # large enough that a typical form still reaches the disk in a single write
+    with open(output_path, "wb", buffering=OUTPUT_WRITE_BUFFER_SIZE) as f_out:
+        pdf.save(f_out, linearize=False)
+
+    logger.debug("PDF saved as %s", output_path)
+
+def classify_field(field_name, keys, field_conf, mapping):
+    """Return the draw pass ("char", "datum", "xmark" or "exact") for a field, or None if it is not drawn"""
+    if isinstance(keys, list):
+        return "char"
+    if keys is not None:
+        if field_name.startswith("datum") or field_name == "geburtsdatum":
+            return "datum"
+        if field_name.startswith("x"):
+            return "xmark"
+    if field_conf is not None:
+        if field_name == "ID" and "id_field" in mapping:
+            return "exact"
+        if "exact_key" in field_conf:
+            return "exact"
+    return None
+
+def classify_fields(field_keys, field_config, mapping):
+    """Group field names by the draw pass that handles them; each field lands in exactly one pass"""
+    field_groups = {"char": [], "datum": [], "xmark": [], "exact": []}
+    for field_name in {**field_keys, **field_config}:
+        category = classify_field(field_name, field_keys.get(field_name), field_config.get(field_name), mapping)
+        if category:
+            field_groups[category].append(field_name)
+    return field_groups
+
+def build_char_positions(draw_positions, field_names, field_keys):
+    """Collect the drawing positions of character fields as parallel (xs, ys) lists"""
+    char_positions = {}
+    for field_name in field_names:
+        positions = [draw_positions[key] for key in field_keys[field_name]]
+        char_positions[field_name] = ([x for x, _ in positions], [y for _, y in positions])
+    return char_positions
+
+def build_draw_positions(mapping, height):
+    """Precompute the bottom-left origin (x, y) drawing position of every mapping key"""
+    return {key: (rect.x0, convert_coords(rect, height)[0]) for key, rect in mapping.items()}
+
+@functools.lru_cache(maxsize=32)
+def build_form_template(form_type, config_mtime, empty_form_mtime):
+    """Build the row-independent parts of a form, cached per form type, config version and empty form version"""
+    config = load_form_config(form_type)
+    empty_form = config.get("empty_form_file", os.path.join(FORMS_DIR, "empty_form.pdf"))
+    
+    # Setup font
+    font_name, bold_font_name = setup_font(config)
+    
+    # Read the empty form once; rows reopen it from memory instead of from disk
+    with open(empty_form, "rb") as f:
+        base_pdf_bytes = f.read()
+    
+    # Read page dimensions from the empty form
+    with pikepdf.open(io.BytesIO(base_pdf_bytes)) as base_pdf:
+        x0, y0, x1, y1 = (float(v) for v in base_pdf.pages[0].mediabox)
+    
+    mapping = build_rects(config["field_coordinates"])
+    field_keys = get_field_keys(config, mapping)
+    field_groups = classify_fields(field_keys, config["field_config"], mapping)
+    draw_positions = build_draw_positions(mapping, y1 - y0)
+    
+    return {
+        "config": config,
+        "empty_form": empty_form,
+        "base_pdf_bytes": base_pdf_bytes,
+        "font_name": font_name,
+        "bold_font_name": bold_font_name,
+        "width": x1 - x0,
+        "height": y1 - y0,
+        "mapping": mapping,
+        "draw_positions": draw_positions,
+        "field_keys": field_keys,
+        "field_groups": field_groups,
+        "char_positions": build_char_positions(draw_positions, field_groups["char"], field_keys),
+    }
+
+def prepare_form_template(form_type):
+    """Return the cached template for a form type, or None if it cannot be loaded"""
     config = load_form_config(form_type)
     if not config:
-        return False
+        return None
     
+    # Check if empty form exists
+    empty_form = config.get("empty_form_file", os.path.join(FORMS_DIR, "empty_form.pdf"))
+    if not check_path_exists(empty_form, f"Empty form file not found: {empty_form}"):
+        return None
+    
+    config_path = os.path.join(CONFIG_DIR, f"{form_type}.json")
+    # The template holds the empty form's bytes and page size, so replacing that PDF
+    # invalidates it just like editing the config does
+    return build_form_template(form_type, os.path.getmtime(config_path), os.path.getmtime(empty_form))
+
+def draw_form_page(c, template, form_data):
+    """Draw one row of form data onto the current page of an overlay canvas"""
+    config = template["config"]
+    empty_form = template["empty_form"]
+    height = template["height"]
+    
+    # Copy the mapping and field keys since rows add positions to them
+    mapping = dict(template["mapping"])
+    field_keys = {field: list(keys) if isinstance(keys, list) else keys
+                  for field, keys in template["field_keys"].items()}
+    
+    # Try to find missing field positions in the PDF
+    missing_fields = [field for field in form_data if field not in field_keys 
+                     and not any(field.startswith(p) for p in ["x", "checkbox"])]
+    
+    field_groups = template["field_groups"]
+    if missing_fields:
+        logger.debug("Searching for positions of missing fields: %s", missing_fields)
+        found_positions = find_field_positions(empty_form, missing_fields)
+        
+        # Add found positions to mapping
+        for field, position in found_positions.items():
+            key_name = f"found_{field}"
+            mapping[key_name] = position
+            field_keys[field] = key_name
+            logger.debug("Added position for %s from PDF analysis", field)
+        
+        # Fields found in the PDF need to be assigned to their draw passes too
+        if found_positions:
+            field_groups = classify_fields(field_keys, config["field_config"], mapping)
+    
+    # Process multi-character fields
+    for field_name in config["field_config"]:
+        if field_name in form_data and isinstance(field_keys.get(field_name), list):
+            field_keys[field_name] = process_multi_char_field(
+                mapping, 
+                field_name, 
+                form_data[field_name], 
+                field_keys[field_name],
+                config["default_letter_spacing"]
+            )
+    
+    # Add drawing positions for any keys this row added to the mapping
+    draw_positions = template["draw_positions"]
+    added_keys = mapping.keys() - draw_positions.keys()
+    if added_keys:
+        draw_positions = {**draw_positions,
+                          **build_draw_positions({k: mapping[k] for k in added_keys}, height)}
+    
+    # Character fields whose positions were extended for this row need their own position lists
+    char_positions = template["char_positions"]
+    extended_fields = [field_name for field_name in field_groups["char"]
+                       if len(field_keys[field_name]) != len(char_positions.get(field_name, ((), ()))[0])]
+    if extended_fields:
+        char_positions = {**char_positions,
+                          **build_char_positions(draw_positions, extended_fields, field_keys)}
+    
+    # Extract text and find ID position if needed - ID position will be None due to patched function
+    id_position = None
+    
+    # The font is part of the page state, so set it for every page
+    c.setFont(template["font_name"], config["font_size"])
+    
+    # Draw various field types
+    draw_character_fields(c, char_positions, field_groups["char"], form_data)
+    draw_datum_fields(c, draw_positions, field_groups["datum"], field_keys, form_data)
+    draw_checkbox_fields(c, draw_positions, field_groups["xmark"], field_keys)
+    draw_exact_key_fields(
+        c, mapping, draw_positions, field_groups["exact"], config["field_config"], form_data, 
+        id_position, template["bold_font_name"], template["font_name"], config["font_size"]
+    )
+
+def render_form(template, form_data, output_path):
+    """Draw one row of form data onto the template and save the filled PDF"""
+    # Prepare canvas, drawing the overlay in memory rather than to a temp file
+    overlay_buffer = io.BytesIO()
+    c = prepare_overlay_canvas(overlay_buffer, template["width"], template["height"])
+    draw_form_page(c, template, form_data)
+    
+    # Save overlay
+    c.save()
+    
+    # Merge overlay with base PDF
+    overlay_buffer.seek(0)
+    with pikepdf.open(overlay_buffer) as overlay_pdf:
+        merge_overlay_with_base(overlay_pdf.pages, template["base_pdf_bytes"], output_path)
+
+def fill_pdf_form(form_type, form_data, output_file=None):
+    """Fill a PDF form with the provided data"""
     try:
-        # Setup font
-        font_name, bold_font_name = setup_font(config)
+        # Load the cached form template (config, font, page size, field keys)
+        template = prepare_form_template(form_type)
+        if not template:
+            return False
         
-        # Define paths
-        empty_form = config.get("empty_form_file", os.path.join(FORMS_DIR, "empty_form.pdf"))
-        temp_overlay = config.get("temp_overlay_file", TEMP_OVERLAY)
+        config = template["config"]
         
         # Use custom output file if provided, otherwise use config
         if output_file:
@@ -486,121 +739,240 @@ def fill_pdf_form(form_type, form_data, output_file=None):
         else:
             output_path = config.get("output_file", os.path.join(OUTPUT_DIR, "filled_form.pdf"))
         
-        # Check if empty form exists
-        if not check_path_exists(empty_form, f"Empty form file not found: {empty_form}"):
-            return False
-        
-        # Get mapping and field keys
-        mapping = config["field_coordinates"]
-        field_keys = get_field_keys(config)
-        
-        # Try to find missing field positions in the PDF
-        missing_fields = [field for field in form_data if field not in field_keys 
-                         and not any(field.startswith(p) for p in ["x", "checkbox"])]
-        
-        if missing_fields:
-            logger.info(f"Searching for positions of missing fields: {missing_fields}")
-            found_positions = find_field_positions(empty_form, missing_fields)
-            
-            # Add found positions to mapping
-            for field, position in found_positions.items():
-                if field in missing_fields:
-                    key_name = f"found_{field}"
-                    mapping[key_name] = position
-                    field_keys[field] = key_name
-                    logger.info(f"Added position for {field} from PDF analysis")
-        
-        # Process multi-character fields
-        for field_name in config["field_config"]:
-            if field_name in form_data and isinstance(field_keys.get(field_name), list):
-                field_keys[field_name] = process_multi_char_field(
-                    mapping, 
-                    field_name, 
-                    form_data[field_name], 
-                    field_keys[field_name],
-                    config["default_letter_spacing"]
-                )
-        
-        # Extract text and find ID position if needed - ID position will be None due to patched function
-        id_position = None
-        
-        # Prepare canvas
-        c, reader, width, height = prepare_overlay_canvas(
-            empty_form, temp_overlay, font_name, config["font_size"]
-        )
-        
-        # Draw various field types
-        draw_character_fields(c, mapping, field_keys, form_data, height)
-        draw_datum_fields(c, mapping, field_keys, form_data, height)
-        draw_checkbox_fields(c, mapping, field_keys, height)
-        draw_exact_key_fields(
-            c, mapping, field_keys, config["field_config"], form_data, 
-            height, id_position, bold_font_name, font_name, config["font_size"]
-        )
-        
-        # Save overlay
-        c.save()
-        
-        # Merge overlay with base PDF
-        merge_overlay_with_base(temp_overlay, empty_form, output_path)
+        # Create output directory if needed
+        if not hasattr(output_path, "write"):
+            output_dir = os.path.dirname(output_path)
+            if output_dir:
+                ensure_dir_exists(output_dir)
         
+        render_form(template, form_data, output_path)
         return True
         
     except Exception as e:
         logger.exception(f"Error filling PDF form: {e}")
         return False
 
-def read_csv_input(csv_file):
-    """Read form data from a CSV file"""
-    if not check_path_exists(csv_file, f"CSV file not found: {csv_file}"):
-        return []
+def iter_csv_rows(csv_file):
+    """Yield form data rows from a CSV file one at a time"""
+    with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        fieldnames = tuple(next(reader, ()))
+        for row in reader:
+            # Skip blank lines like DictReader does
+            if row:
+                yield dict(zip(fieldnames, row))
+
+def iter_form_tasks(form_type, form_data_rows, output_dir):
+    """Yield one fill task per form data row"""
+    # One timestamp per batch; the row number keeps the filenames unique
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    for i, form_data in enumerate(form_data_rows, 1):
+        # Generate output filename
+        output_file = os.path.join(output_dir, f"filled_form_{i}_{timestamp}.pdf")
+        yield (form_type, form_data, output_file, i)
 
-    form_data_list = []
+def init_fill_worker(form_type, log_level=logging.INFO):
+    """Warm up a worker process: register fonts and build the form template once at startup"""
+    # Spawned workers start with fresh logging, so apply the parent's level (e.g. -v)
+    logger.setLevel(log_level)
+    
     try:
-        with open(csv_file, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            form_data_list = list(reader)
+        prepare_form_template(form_type)
+    except Exception as e:
+        # Leave the error to be reported by the individual tasks
+        logger.error(f"Error preparing form template: {e}")
+
+def fill_form_chunk(tasks):
+    """
+    Fill a chunk of forms of one form type; tasks are (form_type, form_data, output_file, index).
+    All overlays are drawn as pages of a single canvas, so the PDF document setup and
+    font embedding happen once per chunk rather than once per row.
+    Returns one success flag per task.
+    """
+    form_type = tasks[0][0]
+    results = [False] * len(tasks)
+    
+    try:
+        template = prepare_form_template(form_type)
+        if not template:
+            return results
+        
+        overlay_buffer = io.BytesIO()
+        c = prepare_overlay_canvas(overlay_buffer, template["width"], template["height"])
         
-        if not form_data_list:
-            logger.warning("No data found in CSV file")
-            return []
+        # Page i of the overlay belongs to task i, rows that fail to draw are not merged
+        drawn = []
+        for i, (_, form_data, _, index) in enumerate(tasks):
+            logger.debug("Processing form %d, data: %s", index, form_data)
+            try:
+                draw_form_page(c, template, form_data)
+                drawn.append(i)
+            except Exception as e:
+                logger.exception(f"Error filling PDF form: {e}")
+            c.showPage()
         
-        logger.info(f"Successfully read {len(form_data_list)} records from CSV file")
-        return form_data_list
+        c.save()
+        overlay_buffer.seek(0)
         
+        with pikepdf.open(overlay_buffer) as overlay_pdf:
+            for i in drawn:
+                try:
+                    merge_overlay_with_base([overlay_pdf.pages[i]], template["base_pdf_bytes"], tasks[i][2])
+                    results[i] = True
+                except Exception as e:
+                    logger.exception(f"Error filling PDF form: {e}")
+    
     except Exception as e:
-        logger.error(f"Error reading CSV file: {e}")
-        return []
+        logger.exception(f"Error filling PDF forms: {e}")
+    
+    return results
 
-def process_batch(form_type, csv_file, output_dir=None):
-    """Process multiple forms from a CSV file"""
-    # Load form data from CSV
-    form_data_list = read_csv_input(csv_file)
-    if not form_data_list:
+def fill_combined_forms(template, form_data_rows, output_file):
+    """
+    Fill one copy of the form per row and save them all as a single multi-page PDF.
+    Every copy shares the template's fonts and content streams, only the overlays differ.
+    Rows that fail to draw are left out; returns one success flag per row.
+    """
+    overlay_buffer = io.BytesIO()
+    c = prepare_overlay_canvas(overlay_buffer, template["width"], template["height"])
+    
+    # Page i of the overlay belongs to row i
+    results = []
+    for index, form_data in enumerate(form_data_rows, 1):
+        logger.debug("Processing form %d, data: %s", index, form_data)
+        try:
+            draw_form_page(c, template, form_data)
+            results.append(True)
+        except Exception as e:
+            logger.exception(f"Error filling PDF form: {e}")
+            results.append(False)
+        c.showPage()
+        if index % PROGRESS_LOG_INTERVAL == 0:
+            logger.info(f"Processed {index} forms")
+    
+    if not any(results):
+        return results
+    
+    c.save()
+    overlay_buffer.seek(0)
+    
+    try:
+        with pikepdf.open(overlay_buffer) as overlay_pdf, \
+                pikepdf.open(io.BytesIO(template["base_pdf_bytes"])) as combined_pdf:
+            # Append a copy of the template pages per row, then drop the untouched originals
+            template_page_count = len(combined_pdf.pages)
+            for i, drawn in enumerate(results):
+                if not drawn:
+                    continue
+                first_page_index = len(combined_pdf.pages)
+                for page_index in range(template_page_count):
+                    combined_pdf.pages.append(combined_pdf.pages[page_index])
+                
+                # Copied pages share the template's resource dictionary, give the stamped
+                # page its own so the overlay is not added to every copy
+                page = combined_pdf.pages[first_page_index]
+                page.Resources = pikepdf.Dictionary(page.Resources)
+                page.add_overlay(overlay_pdf.pages[i])
+            
+            del combined_pdf.pages[:template_page_count]
+            save_pdf(combined_pdf, output_file)
+    
+    except Exception as e:
+        logger.exception(f"Error saving combined PDF: {e}")
+        return [False] * len(results)
+    
+    return results
+
+def iter_chunks(iterable, size):
+    """Yield lists of up to size items from an iterable"""
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+def iter_pool_results(executor, fn, iterable, max_pending):
+    """
+    Like executor.map, yielding results in input order, but with at most max_pending
+    tasks submitted at a time, so the input is only consumed as results come back.
+    """
+    pending = deque()
+    for item in iterable:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+def process_batch(form_type, csv_file, output_dir=None, combined=False):
+    """Process multiple forms from a CSV file; combined writes all forms into one PDF"""
+    if not check_path_exists(csv_file, f"CSV file not found: {csv_file}"):
         return False
     
-    # Create output directory if specified
-    if output_dir:
-        ensure_dir_exists(output_dir)
+    # Build the form template once before any row is filled, so a broken config or
+    # missing font fails the batch up front
+    try:
+        template = prepare_form_template(form_type)
+        if not template:
+            return False
+    except Exception as e:
+        logger.error(f"Error preparing form template: {e}")
+        return False
     
-    # Process each row
-    success_count = 0
-    for i, form_data in enumerate(form_data_list):
-        # Generate output filename
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        if output_dir:
-            output_file = os.path.join(output_dir, f"filled_form.pdf")
+    # Create the output directory once for the whole batch
+    output_dir = output_dir or OUTPUT_DIR
+    ensure_dir_exists(output_dir)
+    
+    try:
+        if combined:
+            # All rows go into a single output file, written by this process
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            output_file = os.path.join(output_dir, f"filled_forms_{timestamp}.pdf")
+            results = fill_combined_forms(template, iter_csv_rows(csv_file), output_file)
         else:
-            output_file = os.path.join(OUTPUT_DIR, f"filled_form_{i+1}_{timestamp}.pdf")
-        
-        logger.info(f"\nProcessing form {i+1} of {len(form_data_list)}")
-        logger.info(f"Data: {form_data}")
-        
-        # Fill the form
-        if fill_pdf_form(form_type, form_data, output_file):
-            success_count += 1
+            # Rows are read lazily, so the first forms are filled while the CSV is still being parsed
+            tasks = iter_form_tasks(form_type, iter_csv_rows(csv_file), output_dir)
+            chunks = iter_chunks(tasks, BATCH_CHUNK_SIZE)
+            
+            # Chunks are independent, so fill them on separate cores, but only start
+            # as many workers as have enough rows to pay for their startup
+            cpu_count = os.cpu_count() or 1
+            chunks_per_worker = -(-POOL_MIN_ROWS_PER_WORKER // BATCH_CHUNK_SIZE)
+            first_chunks = list(itertools.islice(chunks, cpu_count * chunks_per_worker))
+            max_workers = min(cpu_count, len(first_chunks) // chunks_per_worker)
+            
+            if max_workers <= 1:
+                results = [result for chunk in itertools.chain(first_chunks, chunks)
+                           for result in fill_form_chunk(chunk)]
+            else:
+                # Spawned rather than forked workers, since the server calls this from
+                # one of several threads whose held locks a fork would copy
+                with ProcessPoolExecutor(max_workers=max_workers,
+                                         mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=init_fill_worker,
+                                         initargs=(form_type, logger.getEffectiveLevel())) as executor:
+                    results = []
+                    # Keep every worker busy with one chunk queued behind it
+                    for chunk_results in iter_pool_results(executor, fill_form_chunk,
+                                                           itertools.chain(first_chunks, chunks),
+                                                           2 * max_workers):
+                        done_before = len(results)
+                        results.extend(chunk_results)
+                        if len(results) // PROGRESS_LOG_INTERVAL > done_before // PROGRESS_LOG_INTERVAL:
+                            logger.info(f"Processed {len(results)} forms")
+    
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        logger.error(f"Error reading CSV file: {e}")
+        return False
+    except Exception as e:
+        # e.g. a worker process died (BrokenProcessPool) or a row could not be pickled
+        logger.exception(f"Error filling PDF forms: {e}")
+        return False
     
-    logger.info(f"\nBatch processing completed. {success_count} of {len(form_data_list)} forms processed successfully.")
+    if not results:
+        logger.warning("No data found in CSV file")
+        return False
+    
+    success_count = sum(1 for result in results if result)
+    logger.info(f"\nBatch processing completed. {success_count} of {len(results)} forms processed successfully.")
     return success_count > 0
 
 def main():
@@ -610,6 +982,7 @@ def main():
     parser.add_argument("-c", "--csv", required=True, help="Input CSV file for batch processing")
     parser.add_argument("-f", "--form", required=True, help="Form type to use")
     parser.add_argument("-o", "--output", help="Output directory for batch processing")
+    parser.add_argument("--combined", action="store_true", help="Write all filled forms into a single multi-page PDF")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging")
     
     args = parser.parse_args()
@@ -618,6 +991,9 @@ def main():
     if args.verbose:
         logger.setLevel(logging.DEBUG)
     
+    # Batch runs are usually redirected to a file, avoid a write per log line
+    buffer_log_output()
+    
     # Create required directories
     for directory in [CONFIG_DIR, FORMS_DIR, OUTPUT_DIR, DATA_DIR]:
         ensure_dir_exists(directory)
@@ -642,7 +1018,7 @@ def main():
     # Process the batch
     logger.info(f"Processing with form type: {args.form}, CSV file: {args.csv}")
     output_dir = args.output if args.output else OUTPUT_DIR
-    success = process_batch(args.form, args.csv, output_dir)
+    success = process_batch(args.form, args.csv, output_dir, combined=args.combined)
     
     # Return appropriate exit code
     if not success:
@@ -1,31 +1,90 @@
 from flask import Flask, request, jsonify, send_file, Response
+from flask_compress import Compress
+from waitress import serve
 import os
 import json
 import tempfile
+import shutil
 import zipfile
 import io
 import csv
-from pdf_form_filler import load_form_config, list_available_forms, fill_pdf_form, process_batch
+import mimetypes
+import time
+import uuid
+from pdf_form_filler import load_form_config, list_available_forms, fill_pdf_form, process_batch, CONFIG_DIR
 
 app = Flask(__name__)
 
+# Compress JSON/text responses in-process (Brotli preferred, gzip fallback)
+app.config['COMPRESS_MIMETYPES'] = ['application/json', 'text/html', 'text/css', 'application/javascript']
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_BR_LEVEL'] = 4
+app.config['COMPRESS_LEVEL'] = 6
+app.config['COMPRESS_MIN_SIZE'] = 1024
+Compress(app)
+
+# When running behind Nginx, hand file delivery off via X-Accel-Redirect.
+# Nginx must expose the app directory as an internal location, e.g.
+#   location /_protected/ { internal; alias /app/; sendfile on; tcp_nopush on; }
+app.config['X_ACCEL_REDIRECT'] = os.environ.get('X_ACCEL_REDIRECT', '').lower() in ('1', 'true', 'yes')
+app.config['X_ACCEL_PREFIX'] = os.environ.get('X_ACCEL_PREFIX', '/_protected/')
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def send_file_accelerated(file_path, mimetype=None, as_attachment=False):
+    """Send a file, letting Nginx stream it when X-Accel-Redirect is enabled"""
+    if not app.config['X_ACCEL_REDIRECT']:
+        return send_file(file_path, mimetype=mimetype, as_attachment=as_attachment)
+    
+    rel_path = os.path.relpath(os.path.abspath(file_path), APP_ROOT)
+    if rel_path.startswith('..'):
+        return jsonify({'error': 'File not found'}), 404
+    
+    file_name = os.path.basename(file_path)
+    resp = Response('')
+    resp.headers['X-Accel-Redirect'] = app.config['X_ACCEL_PREFIX'] + rel_path.replace(os.sep, '/')
+    resp.headers['Content-Type'] = mimetype or mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+    disposition = 'attachment' if as_attachment else 'inline'
+    resp.headers['Content-Disposition'] = f'{disposition}; filename="{file_name}"'
+    return resp
+
+# Pre-serialized form types payload, rebuilt only when forms_config changes
+_form_types_cache = {'mtime': None, 'body': None}
+
+def get_form_types_json():
+    """
+    Return the serialized form types list and the forms_config mtime it was built
+    from, reusing the payload while forms_config is unchanged
+    """
+    try:
+        mtime = os.stat(CONFIG_DIR).st_mtime_ns
+    except OSError:
+        mtime = None
+    
+    if _form_types_cache['body'] is None or _form_types_cache['mtime'] != mtime:
+        form_types = []
+        for form_id in list_available_forms():
+            config = load_form_config(form_id)
+            if config:
+                form_types.append({
+                    'id': form_id,
+                    'name': config.get('name', form_id),
+                    'type': 'pdf'  # You could determine this based on the form config
+                })
+        _form_types_cache['body'] = json.dumps({'formTypes': form_types}).encode('utf-8')
+        _form_types_cache['mtime'] = mtime
+    
+    return _form_types_cache['body'], _form_types_cache['mtime']
+
 # API endpoints for form operations
 @app.route('/api/forms/types', methods=['GET'])
 def get_form_types():
-    # List available form configurations
-    forms = list_available_forms()
-    form_types = []
+    body, mtime = get_form_types_json()
+    resp = Response(body, mimetype='application/json', headers={'Cache-Control': 'no-cache'})
     
-    for form_id in forms:
-        config = load_form_config(form_id)
-        if config:
-            form_types.append({
-                'id': form_id,
-                'name': config.get('name', form_id),
-                'type': 'pdf'  # You could determine this based on the form config
-            })
-    
-    return jsonify({'formTypes': form_types})
+    # Clients revalidate every time and get a 304 until forms_config changes. The
+    # ETag is weak so Flask-Compress leaves it as is rather than adding the encoding
+    resp.set_etag(f"forms-{mtime}", weak=True)
+    return resp.make_conditional(request)
 
 @app.route('/api/forms/templates', methods=['GET'])
 def get_templates():
@@ -54,7 +113,7 @@ def preview_form():
         return jsonify({'error': 'Form not found'}), 404
     
     # Return the empty form PDF
-    return send_file(config['empty_form_file'], mimetype='application/pdf')
+    return send_file_accelerated(config['empty_form_file'], mimetype='application/pdf')
 
 @app.route('/api/forms/preview-csv', methods=['POST'])
 def preview_csv():
@@ -105,50 +164,48 @@ def process_forms():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
-    # Create a unique batch ID
-    import time
-    batch_id = f"batch_{int(time.time())}"
+    # Create a unique batch ID (nanosecond timestamp plus random suffix, safe for concurrent uploads)
+    batch_id = f"batch_{time.time_ns()}_{uuid.uuid4().hex[:8]}"
     output_dir = os.path.join('output', batch_id)
-    
-    # Save to a temporary file
-    temp_csv = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
-    file.save(temp_csv.name)
-    temp_csv.close()
+    os.makedirs(output_dir, exist_ok=True)
     
     try:
-        # Process the batch
-        success = process_batch(form_type, temp_csv.name, output_dir)
+        # Spool the upload to a temporary file; it is closed before being reopened
+        # by name, which Windows does not allow while it is still open
+        temp_csv = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
+        try:
+            with temp_csv:
+                shutil.copyfileobj(file.stream, temp_csv, length=1 << 16)
+            
+            # Process the batch
+            success = process_batch(form_type, temp_csv.name, output_dir)
+            row_count = count_csv_rows(temp_csv.name)
+        finally:
+            os.unlink(temp_csv.name)  # Clean up
         
         # Count the number of files in the output directory
         files = []
-        if os.path.exists(output_dir):
-            for filename in os.listdir(output_dir):
-                if filename.endswith('.pdf'):
-                    file_path = os.path.join(output_dir, filename)
-                    file_size = os.path.getsize(file_path)
-                    files.append({
-                        'name': filename,
-                        'size': f"{file_size / 1024:.2f} KB",
-                        'date': time.strftime('%Y-%m-%d', time.gmtime(os.path.getmtime(file_path)))
-                    })
+        for filename in os.listdir(output_dir):
+            if filename.endswith('.pdf'):
+                file_path = os.path.join(output_dir, filename)
+                file_size = os.path.getsize(file_path)
+                files.append({
+                    'name': filename,
+                    'size': f"{file_size / 1024:.2f} KB",
+                    'date': time.strftime('%Y-%m-%d', time.gmtime(os.path.getmtime(file_path)))
+                })
         
         success_count = len(files)
         
-        # Clean up temporary CSV file
-        os.unlink(temp_csv.name)
-        
         return jsonify({
             'success': success,
             'batchId': batch_id,
             'successCount': success_count,
-            'successRate': f"{success_count / count_csv_rows(temp_csv.name) * 100:.0f}%" if success_count > 0 else "0%",
+            'successRate': f"{success_count / row_count * 100:.0f}%" if success_count > 0 and row_count else "0%",
             'files': files
         })
         
     except Exception as e:
-        # Clean up temporary CSV file
-        if os.path.exists(temp_csv.name):
-            os.unlink(temp_csv.name)
         return jsonify({'error': f'Error processing forms: {str(e)}'}), 500
 
 def count_csv_rows(csv_file):
@@ -170,7 +227,7 @@ def download_form():
         if os.path.isdir(batch_path):
             file_path = os.path.join(batch_path, file_name)
             if os.path.exists(file_path):
-                return send_file(file_path, as_attachment=True)
+                return send_file_accelerated(file_path, as_attachment=True)
     
     return jsonify({'error': 'File not found'}), 404
 
@@ -206,4 +263,10 @@ if __name__ == '__main__':
     if not os.path.exists('output'):
         os.makedirs('output')
     
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Serve with a multi-threaded production WSGI server instead of the Flask dev server
+    serve(
+        app,
+        host=os.environ.get('HOST', '127.0.0.1'),
+        port=int(os.environ.get('PORT', 5000)),
+        threads=int(os.environ.get('WSGI_THREADS', 8))
+    )